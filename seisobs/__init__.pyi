@@ -0,0 +1,2 @@
+from . import core, specs
+from .core import Seisob, seis2cat, seis2disk
@@ -6,15 +6,22 @@ Created on Sat Jan 30 13:13:36 2016
 functions to read a single S-file into a catalog object
 """
 
+import hashlib
+import numpy as np
 import obspy
 import os
 import seisobs
 import pandas as pd
+import re
 import warnings
 from builtins import str as text
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 
 def seis2cat(sfile, authority='local', inventory_object=None, 
-             default_network='UK', default_channel='BH', verbose=False):
+             default_network='UK', default_channel='BH', verbose=False,
+             workers=1):
     """
     Function to convert an s-file, or directory of s-files, to obspy catalog 
     object
@@ -25,7 +32,7 @@ def seis2cat(sfile, authority='local', inventory_object=None,
         Path to an s-file (nordic format) or directory of s-files
     authority : str
         Default authority for resource IDs
-    inventory_object : None, obspy.station.Inventory or path to such
+    inventory_object : None, obspy.Inventory or path to such
         If not None, an inventory object or path to a file that is readable
         by obspy.read_station to use to obtain full NSLC codes. See docs string
         on Seisob._get_nslc for info on why this might be useful. 
@@ -37,19 +44,25 @@ def seis2cat(sfile, authority='local', inventory_object=None,
         guessing at station codes
     verbose : bool
         If True print all user warnings, else suppress them
+    workers : int or None
+        Number of processes used to read a directory of s-files. 1 reads
+        them serially in this process, None uses one per CPU
     
     Returns
     -------
     obspy.core.event.Catalog object
     """
-    so = Seisob(**locals())
-    cat = so.seis2cat(sfile)
+    so = Seisob(authority=authority, inventory_object=inventory_object,
+                default_network=default_network, 
+                default_channel=default_channel, verbose=verbose)
+    cat = so.seis2cat(sfile, workers=workers)
     return cat
 
 def seis2disk(sfile, sformat='quakeml', savedir='quakeml', ext='.xml',
               directory_struct='yyyy-mm', skip_if_exists=True, 
               authority='local', inventory_object=None, 
-              default_network='UK', default_channel='BH', verbose=False):
+              default_network='UK', default_channel='BH', verbose=False,
+              workers=1):
     """
     Save a seisan s-file, or directory of s-files, in nordic format,
     to disk using obspy Catalog as intermediate step. Raises ValueError
@@ -82,7 +95,7 @@ def seis2disk(sfile, sformat='quakeml', savedir='quakeml', ext='.xml',
         to next
     authority : str
         Default authority for resource IDs
-    inventory_object : None, obspy.station.Inventory or path to such
+    inventory_object : None, obspy.Inventory or path to such
         If not None, an inventory object or path to a file that is readable
         by obspy.read_station to use to obtain full NSLC codes. See docs string
         on Seisob._get_nslc for info on why this might be useful. 
@@ -94,9 +107,16 @@ def seis2disk(sfile, sformat='quakeml', savedir='quakeml', ext='.xml',
         guessing at station codes
     verbose : bool
         If True print all user warnings, else suppress them
+    workers : int or None
+        Number of processes used to convert a directory of s-files. 1 
+        converts them serially in this process, None uses one per CPU
     """
-    so = Seisob(**locals())
-    so.seis2disk(**locals())
+    so = Seisob(authority=authority, inventory_object=inventory_object,
+                default_network=default_network, 
+                default_channel=default_channel, verbose=verbose)
+    so.seis2disk(sfile, sformat=sformat, savedir=savedir, ext=ext, 
+                 directory_struct=directory_struct, 
+                 skip_if_exists=skip_if_exists, workers=workers)
 
 ##### seis2ob and supporting functions
 
@@ -108,7 +128,7 @@ class Seisob(object):
     -----------
     authority : str
         Default authority for resource IDs
-    inventory_object : None, obspy.station.Inventory or path to such
+    inventory_object : None, obspy.Inventory or path to such
         If not None, an inventory object or path to a file that is readable
         by obspy.read_station to use to obtain full NSLC codes. See docs string
         on Seisob._get_nslc for info on why this might be useful. 
@@ -120,31 +140,57 @@ class Seisob(object):
         guessing at station codes
     verbose : bool
         If True print all user warnings, else suppress them
+    validate : bool
+        If True run each line's validation method from the specs module as
+        it is read. If False only run column-wise range checks on the type 1
+        lines of each s-file, which is faster for bulk reading of trusted 
+        files
+    cache_dir : None or str
+        If not None, a directory where the parsed contents of each s-file 
+        are pickled. Later reads of an s-file that has not been modified
+        load the pickle instead of parsing the file again
     """
     def __init__(self, authority='local', inventory_object=None, 
                  default_network='UK', default_channel='BH', verbose=False,
-                 **kwargs):
+                 validate=True, cache_dir=None, **kwargs):
         self.authority = authority
         self.default_network = default_network
         self.verbose = verbose
+        self.validate = validate
+        self.cache_dir = cache_dir
         self.default_channel = default_channel
         self.df_cache = {}
+        self._cache_sdf = None # the sdf df_cache belongs to
+        # args needed to rebuild this instance in worker processes
+        self._config = dict(authority=authority, 
+                            inventory_object=inventory_object,
+                            default_network=default_network,
+                            default_channel=default_channel, verbose=verbose,
+                            validate=validate, cache_dir=cache_dir)
         if isinstance(inventory_object, text):
             try:
                 inventory_object = obspy.read_inventory(inventory_object)
             except (ValueError, IOError):
                 msg = 'failed to read %s' % inventory_object
                 raise ValueError(msg)
-        if not isinstance(inventory_object, obspy.station.Inventory):
+        if not isinstance(inventory_object, obspy.Inventory):
             self.inventory = None
+            self._nslc_index = None
+            self._station_index = None
         else:
             self.inventory = inventory_object 
             inv = self.inventory
             chans = [x.split('.') for x in inv.get_contents()['channels']]
             cols = ['network', 'station', 'location', 'channel']
             self.wid_df = pd.DataFrame(chans, columns=cols)
+            # (station, component) and station -> nslc, first channel wins
+            self._nslc_index = {}
+            self._station_index = {}
+            for net, sta, loc, cha in chans:
+                self._nslc_index.setdefault((sta, cha[-1:]), (net, sta, loc, cha))
+                self._station_index.setdefault(sta, (net, sta, loc, cha))
     
-    def seis2cat(self, sfile, **kwargs):
+    def seis2cat(self, sfile, workers=1, **kwargs):
         """
         Read a seisan s-file, or directory of s-files, 
         in nordic format and return an obspy catalog object. Raises ValueError
@@ -154,6 +200,9 @@ class Seisob(object):
         -----------
         sfile : str
             Path to the sfile or sdirectory
+        workers : int or None
+            Number of processes used to read a directory of s-files. 1 reads
+            them serially in this process, None uses one per CPU
         
         Returns
         -------
@@ -163,10 +212,11 @@ class Seisob(object):
         ------
         http://seis.geus.net/software/seisan/seisan.pdf appendix A
         """
-        cat = obspy.core.event.Catalog()
+        events = []
         if os.path.isdir(sfile):
-            for sfi in self._get_sfil_from_dir(sfile):
-                cat += self.seis2cat(sfi)
+            sfiles = self._get_sfil_from_dir(sfile)
+            for subcat in self._map_sfiles('seis2cat', sfiles, workers):
+                events.extend(subcat.events)
         elif os.path.isfile(sfile):
             try:
                 sdf = self.load_sfile_into_df(sfile)
@@ -174,15 +224,17 @@ class Seisob(object):
                 msg = '%s is not a proper S-File' % sfile
                 self.warn(msg)
                 return obspy.core.event.Catalog()
-            eve = self._load_event(sdf, sfile)
-            cat.events.append(eve)
+            utc = self._get_utc_from_sfile_name(sfile)
+            events.append(self._load_event(sdf, sfile, utc))
+        cat = obspy.core.event.Catalog(events=events) # build once
         if len(cat.events) == 0:
             msg = 'No valid s-files found, no events created'
             raise ValueError(msg)
         return cat
         
     def seis2disk(self, sfile, sformat='quakeml', savedir='quakeml', ext='.xml',
-                  directory_struct='yyyy-mm', skip_if_exists=True, **kwargs):
+                  directory_struct='yyyy-mm', skip_if_exists=True, workers=1, 
+                  **kwargs):
         """
         Save a seisan s-file, or directory of s-files, in nordic format,
         to disk using obspy Catalog as intermediate step. Raises ValueError
@@ -213,11 +265,19 @@ class Seisob(object):
             If a file already exists that the new file would be named, 
             guessing based on s-file name, then don't read file just continue
             to next
+        workers : int or None
+            Number of processes used to convert a directory of s-files. 1 
+            converts them serially in this process, None uses one per CPU
     
         """
         if os.path.isdir(sfile):
-            for sfi in self._get_sfil_from_dir(sfile):
-                self.seis2disk(sfi, sformat, savedir, ext, directory_struct)
+            sfiles = self._get_sfil_from_dir(sfile)
+            save_kwargs = dict(sformat=sformat, savedir=savedir, ext=ext, 
+                               directory_struct=directory_struct,
+                               skip_if_exists=skip_if_exists)
+            for _ in self._map_sfiles('seis2disk', sfiles, workers, 
+                                      **save_kwargs):
+                pass
         elif os.path.isfile(sfile):
             utc = self._get_utc_from_sfile_name(sfile)
             sname = self._get_save_name(utc, ext, directory_struct, savedir)
@@ -233,27 +293,33 @@ class Seisob(object):
                 msg = '%s is not a proper S-File' % sfile
                 self.warn(msg)
                 return 
-            eve = self._load_event(sdf, sfile)
+            eve = self._load_event(sdf, sfile, utc)
             cat = obspy.core.event.Catalog(events=[eve])
             self._save_event(cat, utc, sformat, sname)
 
+    def _map_sfiles(self, method, sfiles, workers, **kwargs):
+        """
+        Yield the output of calling method (name of a Seisob method) on each
+        s-file in sfiles. If workers is not 1 the s-files are spread over a
+        pool of processes, each holding its own copy of this Seisob
+        """
+        if workers == 1:
+            for sfi in sfiles:
+                yield getattr(self, method)(sfi, **kwargs)
+            return
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self._config,)) as executor:
+            args = (repeat(method), sfiles, repeat(kwargs))
+            for out in executor.map(_run_worker, *args, chunksize=8):
+                yield out
+
     def _get_utc_from_sfile_name(self, sfile):
-        sp0, sp1 = os.path.basename(sfile).split('.S')
-        udi = {}
-        udi['day'] = int(sp0[:2])
-        udi['hour'] = int(sp0[3:5])
-        udi['minute'] = int(sp0[5:7])
-        udi['second'] = int(sp0[8:10])
-        udi['year'] = int(sp1[:4])
-        udi['month'] = int(sp1[4:6])
-        utc = obspy.UTCDateTime(**udi)
-        return utc
+        return _utc_from_sfile_name(os.path.basename(sfile))
     
     def _get_save_name(self, utc, ext, directory_struct, savedir):
         subdir = self._get_subdir(utc, directory_struct, savedir)
-        if not os.path.exists(subdir):
-            os.makedirs(subdir)
-        filename = str(utc).split('.')[0].replace(':', '-') + ext
+        os.makedirs(subdir, exist_ok=True) # other workers may be making it too
+        filename = _utc_fname(utc) + ext
         return os.path.join(subdir, filename)
     
     def _save_event(self, cat, utc, sformat, sname):
@@ -292,66 +358,116 @@ class Seisob(object):
         --------
         A DataFrame with columns of linetype and series
         """
-        if sfile.split('.')[-1] == 'sebk':
+        if self.cache_dir is None:
+            return self._read_sfile_into_df(sfile)
+        cache_name = self._get_cache_name(sfile)
+        if os.path.exists(cache_name):
+            return pd.read_pickle(cache_name)
+        df = self._read_sfile_into_df(sfile)
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        temp_name = '%s.%d' % (cache_name, os.getpid()) # workers may race
+        df.to_pickle(temp_name)
+        os.replace(temp_name, cache_name)
+        return df
+    
+    def _get_cache_name(self, sfile):
+        # key on path, modification time and size so edited files are reread
+        stat = os.stat(sfile)
+        key = '%s|%d|%d|%s' % (os.path.abspath(sfile), stat.st_mtime_ns, 
+                               stat.st_size, self.validate)
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pkl'
+        return os.path.join(self.cache_dir, name)
+    
+    def _read_sfile_into_df(self, sfile):
+        if sfile.endswith('.sebk'): # directory scans never yield these
             msg = '%s is a seisan backup file' % sfile
             raise ValueError(msg)
-        df = pd.DataFrame(columns=['linetype', 'series'], dtype=object)
-        with open(sfile, 'r') as sfile:
-            for slnum, sline in enumerate(sfile):
-                sli = sline.decode('utf-8').rstrip(os.linesep)
-                if len(sline.rstrip()) < 1: # if blank line at end of file
+        rows = []
+        # nordic fields are fixed byte columns, latin-1 maps each byte to
+        # exactly one character so column positions are preserved
+        with open(sfile, 'r', encoding='latin-1', buffering=1 << 20) as fi:
+            for sline in fi:
+                sli = sline.rstrip('\n')
+                if not sli.strip(): # if blank line at end of file
                     continue
                 try:
-                    slin = Sline(sli, seiob=self)
+                    slin = Sline(sli, validate=self.validate, seiob=self)
                 except (ValueError):
-                    msg = '%s in %s is not a valid line, skipping' % (sline, sfile)
+                    msg = '%s in %s is not a valid line, skipping' % (sli, sfile)
                     self.warn(msg)
                     continue
-                df.loc[len(df)] = {'linetype':slin.slinetype, 'series':slin.sseries}
+                rows.append((slin.slinetype, slin.sseries))
+        if not self.validate:
+            rows = self._drop_bad_values(rows, sfile)
+        df = pd.DataFrame(rows, columns=['linetype', 'series'], dtype=object)
         self._validate_sdf(df, sfile)
         return df
     
-    def _load_event(self, sdf, sfile):
+    def _load_event(self, sdf, sfile, utc=None):
         """
         Function to take the sdf (which contains all files read in) and create an
         event object
         """
-        self.df_cache = {} # clear cache on new event
+        self._prime_cache(sdf)
         evdi = {}
-        
-        magnitudes = self._get_magnitudes(sdf)
-        picks, arrivals, amplitudes = self._get_picks_arrivals_amplitudes(sdf) 
-        origins = self._get_origins(sdf, arrivals)
+        try:
+            magnitudes = self._get_magnitudes(sdf)
+            picks, arrivals, amplitudes = (
+                self._get_picks_arrivals_amplitudes(sdf))
+            origins = self._get_origins(sdf, arrivals)
+            evdi['comments'] = self.get_comments(sdf)
+            evdi['event_descriptions'] = self._make_description(sdf)
+        finally: # the cached dfs are only good for this event
+            self._clear_cache()
         # load various params
         evdi['picks'] = picks
         evdi['origins'] = origins
         evdi['magnitudes'] = magnitudes
         evdi['amplitudes'] = amplitudes   
-        evdi['resource_id'] = self._gen_event_resource_id(sfile)
-        evdi['comments'] = self.get_comments(sdf)
-        evdi['event_descriptions'] = self._make_description(sdf)
+        if utc is None:
+            utc = self._get_utc_from_sfile_name(sfile)
+        evdi['resource_id'] = self._gen_event_resource_id(utc)
         eve = obspy.core.event.Event(**evdi)
         # set preferred origin and magnitudes
+        # use the id objects, not str, so they still resolve after pickling
         if len(origins):
-            eve.preferred_origin_id = str(eve.origins[0].resource_id)
+            eve.preferred_origin_id = eve.origins[0].resource_id
         if len(magnitudes):
-            eve.preferred_magnitude_id = str(eve.magnitudes[0].resource_id)
+            eve.preferred_magnitude_id = eve.magnitudes[0].resource_id
 
         return eve
     
     def get_comments(self, sdf):
-        sd3 = sdf2df(sdf, '3')
+        sd3 = sdf2df(sdf, '3', self)
         comments = []
-        for ind, row in sd3.iterrows():
-            com = obspy.core.event.Comment(text=row.comment)
+        for comment in sd3['comment']:
+            com = obspy.core.event.Comment(text=comment)
             comments.append(com)
         return comments
 
-    def _gen_event_resource_id(self, sfile):
-        # Generate event resource id based on time in first origin
-        utc = self._get_utc_from_sfile_name(sfile)
-        date_str = str(utc).split('.')[0].replace(':','-')
-        resource_id = obspy.core.event.ResourceIdentifier(date_str)
+    def _prime_cache(self, sdf):
+        """
+        Clear df_cache and fill it with the dataframe of every linetype, 
+        splitting the rows of sdf by linetype in a single pass
+        """
+        groups = {}
+        for linetype, row in zip(sdf['linetype'], sdf['series']):
+            groups.setdefault(linetype, []).append(row)
+        self.df_cache = {linetype: _rows2df(rows, linetype) 
+                         for linetype, rows in groups.items()}
+        for linetype in seisobs.specs.specs: # absent linetypes get empty dfs
+            if linetype not in self.df_cache:
+                self.df_cache[linetype] = _empty_df(linetype)
+        self._cache_sdf = sdf
+    
+    def _clear_cache(self):
+        self.df_cache = {}
+        self._cache_sdf = None
+    
+    def _gen_event_resource_id(self, utc):
+        # Generate event resource id based on time in s-file name
+        resource_id = obspy.core.event.ResourceIdentifier(_utc_fname(utc))
         return resource_id
 
     ### Get origins
@@ -360,22 +476,25 @@ class Seisob(object):
         using the sdf get the origins
         """
         origins = []
-        df1 = sdf2df(sdf, '1')
-        dfe = sdf2df(sdf, 'E')
-        dfi = sdf2df(sdf, 'I')
-        for ind, row in df1.iterrows(): # assume Hypoinv reflects first line 1
-            origin = self._origin_from_1line(ind, row, dfe, dfi, arrivals)
+        df1 = sdf2df(sdf, '1', self)
+        dfe = sdf2df(sdf, 'E', self)
+        dfi = sdf2df(sdf, 'I', self)
+        utcs = self._get_utcs(df1)
+        # assume Hypoinv reflects first line 1
+        for ind, row in enumerate(df1.itertuples(index=False)):
+            origin = self._origin_from_1line(ind, row, dfe, dfi, arrivals,
+                                             utcs[ind])
             origins.append(origin)
         return origins
     
-    def _origin_from_1line(self, ind, row, dfe, dfi, arrivals):
+    def _origin_from_1line(self, ind, row, dfe, dfi, arrivals, utc=None):
         ordi = {} # init blank dict to stuff origin keyword params in
         # get specialized linetypes
 
         ordi['latitude'] = row.latitude
         ordi['longitude'] = row.longitude
         ordi['depth'] = row.depth
-        ordi['time'] = self._get_utc(row)
+        ordi['time'] = self._get_utc(row) if utc is None else utc
         ordi['fixed_time'] = row.fixotime == 'F' or row.fixotime == 'f'
         ordi['creation_info'] = self._get_creation_info(row, dfi)
         ordi['quality'] = self._get_quality(row, dfe)
@@ -393,7 +512,7 @@ class Seisob(object):
         return origin
     
     def _make_description(self, sdf):
-        df1 = sdf2df(sdf, '1')
+        df1 = sdf2df(sdf, '1', self)
         ser = df1.iloc[0] # assume first 1 line has correct info
         des = ser.distancecode + ser.eventid
         return [obspy.core.event.EventDescription(des)]
@@ -422,16 +541,18 @@ class Seisob(object):
         """
         Function for parsing info from the #4 lines
         """
-        df1 = sdf2df(sdf, '1') # checked that first line is one earlier
+        df1 = sdf2df(sdf, '1', self) # checked that first line is one earlier
         utc1 = self._get_utc(df1.iloc[0]) # start time in line 1
-        df4 = sdf2df(sdf, '4')
+        day1 = self._get_day_start(utc1) # built once, picks are offsets
+        df4 = sdf2df(sdf, '4', self)
         picks = []
         arrivals = []
         amplitudes = []
         get_nslc_dict = self._nslc_method_prep(sdf)        
-        for ind, row in df4.iterrows(): # iterate through all pick lines
+        # iterate through all pick lines
+        for ind, row in enumerate(df4.itertuples(index=False)):
             get_nslc_dict['ser4'] = row
-            pick = self._get_pick(ind, row, get_nslc_dict, utc1)
+            pick = self._get_pick(ind, row, get_nslc_dict, utc1, day1)
             picks.append(pick)
             if not pick.phase_hint in seisobs.specs.amp_phases:
                 arrival = self._get_arrival(ind, row, pick)
@@ -441,10 +562,10 @@ class Seisob(object):
                 amplitudes.append(amplitude)
         return picks, arrivals, amplitudes
     
-    def _get_pick(self, ind, row, get_nscl_dict, utc1):
+    def _get_pick(self, ind, row, get_nscl_dict, utc1, day1=None):
         pidi = {} # pick dict (don't confuse with dic pic)
         pidi['evaluation_mode'] = "manual" if row.autoflag == ' ' else 'automatic'
-        pidi['time'] = self._get_pick_time(row, utc1)
+        pidi['time'] = self._get_pick_time(row, utc1, day1)
         pidi['phase_hint'] = row.phaseid
         pidi['polarity'] = self._get_polarity(row)
         pidi['onset'] = self._get_onset(row)
@@ -485,30 +606,15 @@ class Seisob(object):
             loc = ' '. This will be wrong but it is as close as we can get. 
         """
         ser = dic['ser4']
-        dic['seiob'] = self
-        # try using comment lines
-        if dic['scnldf'] is not None:
-            try:
-                return get_nslc_from_comment(**dic)
-            except ValueError:
-                msg = (('Comment lines with id exist but %s %s is not found' 
-                       ) % (ser.station, ser.component))
-                self.warn(msg)
-         # try using station inventory     
-        if dic['nslcdf'] is not None:
-            try:
-                return get_nslc_from_inventory(**dic)
-            except ValueError:
-                msg = (('Valid station inventory exist but %s %s is not found' 
-                        ) % (ser.station, ser.component))
-                self.warn(msg)
-        # try loading waveform file to get info
-        if dic['st'] is not None:
+        # the usable methods were picked once per event in _nslc_method_prep
+        for get_nslc, msg in dic['nslc_chain']:
+            if get_nslc is get_nscl_from_waveform:
+                if self._load_nslc_stream(dic) is None:
+                    continue # no readable waveform for this event
             try:
-                return get_nscl_from_waveform(**dic)
+                return get_nslc(**dic)
             except ValueError:
-                msg = (('Valid waveform file exist but %s %s is not in it') 
-                        % (ser.station, ser.component))
+                self.warn(msg % (ser.station, ser.component))
         # everything has failed if you are here, fill in partial info
         msg = (('All other methods failed, filling in partial nslc for station'
                 ' %s on component %s') % (ser.station, ser.component))
@@ -520,9 +626,10 @@ class Seisob(object):
         Because seisan line 4 types only have station and component, a method
         for getting the network, full channel, and location code is needed. 
         This function stuffs the things the get_nscl functions will need into
-        a dictionary to be passed as kwargs. A function done the line will
-        determine which of the four (defined under misc section in core) to 
-        use.
+        a dictionary to be passed as kwargs. The methods (defined under misc 
+        section in core) that can be used for this event are stored, in the 
+        order they should be tried, as (function, failure message) tuples 
+        under the nslc_chain key.
 
         """        
         out = {}
@@ -531,34 +638,82 @@ class Seisob(object):
         if len(scnldf) == 0: # if this seems to have failed
             scnldf = None
         # try using attached pick_id_object
-        if isinstance(self.inventory, obspy.station.Inventory):
+        if isinstance(self.inventory, obspy.Inventory):
             nslcdf = self.wid_df
         else:
             nslcdf = None
-        # try using waveform
-        try: 
-            st = self.load_sfile_stream(sdf)
-        except (ValueError, IOError, AttributeError): 
-            st = None             
+        # try using waveform, only read if the methods above miss a pick
         out['scnldf'] = scnldf
+        out['scnl_index'] = None if scnldf is None else _scnl_index(scnldf)
         out['nslcdf'] = nslcdf
-        out['st'] = st
+        out['nslc_index'] = self._nslc_index
+        out['station_index'] = self._station_index
+        out['st'] = None
+        out['st_loader'] = lambda: self.load_sfile_stream(sdf)
         out['network'] = self.default_network
         out['channel_prefix'] = self.default_channel
+        out['seiob'] = self
+        chain = []
+        if scnldf is not None:
+            msg = 'Comment lines with id exist but %s %s is not found'
+            chain.append((get_nslc_from_comment, msg))
+        if nslcdf is not None:
+            msg = 'Valid station inventory exist but %s %s is not found'
+            chain.append((get_nslc_from_inventory, msg))
+        msg = 'Valid waveform file exist but %s %s is not in it'
+        chain.append((get_nscl_from_waveform, msg))
+        out['nslc_chain'] = tuple(chain)
         return out
+
+    def load_sfile_stream(self, arg):
+        """
+        Function to load the seisan file linked to an s-file into an obspy 
+        stream
+        
+        arg : str or df
+            arg can be either a path to an s-file, or a dataframe created with 
+            the load_sfile_into_df function
+        
+        Returns
+        --------
+        An obspy Stream object
+        """
+        if isinstance(arg, text):
+            df = self.load_sfile_into_df(arg)
+        if isinstance(arg, pd.DataFrame):
+            df = arg
+        df6 = sdf2df(df, '6') # not cached, df may not be the current event
+        if len(df6) != 1:
+            msg = 'Exactly one line 6 is required, more or less were found'
+            raise ValueError(msg)
+        path = df6.iloc[0].comment.strip() # the line holds just the name
+        st = obspy.read(path)
+        return st
+
+    def _load_nslc_stream(self, dic):
+        """
+        Load the waveform of the event into dic the first time a pick needs
+        it, return None if it can't be read
+        """
+        if dic['st_loader'] is not None:
+            try:
+                dic['st'] = dic['st_loader']()
+            except (ValueError, IOError, TypeError):
+                dic['st'] = None
+            dic['st_loader'] = None # only try once per event
+        return dic['st']
             
             
     def _make_scnl_df(self, sdf):
         # take a df with comment lines that have scnl and return dataframe
         sdf_cid = self._get_comments_with_str(sdf, 'CHANNELID')
         cols = ['station', 'channel', 'network', 'location']
-        df = pd.DataFrame(columns=cols)
-        for ind, row in sdf_cid.iterrows():
-            com = row.series.comment.split(':')[1].rstrip()
+        rows = []
+        for comment in sdf_cid['comment']:
+            com = comment.split(':')[1].rstrip()
             sta, cha, net, loc = [x.strip() for x in com.split('.')]
-            ser = pd.Series([sta, cha, net, loc], index=cols)
-            df.loc[len(df)] = ser
-        return df
+            rows.append((sta, cha, net, loc))
+        return pd.DataFrame(rows, columns=cols)
     
     def _get_onset(self, ser):
         if ser.qualityindicator.upper() == 'I':
@@ -576,16 +731,20 @@ class Seisob(object):
         else:
             return "undecidable"
         
-    def _get_pick_time(self, ser, utc1): # get the utc time in first line1
-        year, month, day = self._get_y_m_d(utc1)
-        hour, minute, second = int(ser.hour), int(ser.minute), ser.second
-        if hour >= 24:
-            hour = hour - 24
-            year, month, day = self._get_y_m_d(utc1 + 3600*24)
-        utc = obspy.UTCDateTime(year=year, month=month, day=day, hour=hour, 
-                                minute=minute)
-        utc += second
-        return utc
+    def _get_pick_time(self, ser, utc1, day1=None):
+        """
+        Pick lines only have hour, minute and second, the date comes from 
+        utc1 (time in first line1). day1 is midnight of that day, pass it in 
+        to avoid rebuilding it for every pick. Hours >= 24 simply roll over 
+        into the next day.
+        """
+        if day1 is None:
+            day1 = self._get_day_start(utc1)
+        return day1 + (3600 * int(ser.hour) + 60 * int(ser.minute) + ser.second)
+    
+    def _get_day_start(self, utc):
+        year, month, day = self._get_y_m_d(utc)
+        return obspy.UTCDateTime(year=year, month=month, day=day)
     
     def _get_y_m_d(self, utc):
         return int(utc.year), int(utc.month), int(utc.day)
@@ -600,25 +759,25 @@ class Seisob(object):
         
     ### Get magnitudes
     def _get_magnitudes(self, sdf):
-        
-        df1 = sdf2df(sdf, '1')
-
+        """
+        Build the magnitudes of all 1 lines, skipping default (null) ones
+        """
+        df1 = sdf2df(sdf, '1', self)
         magkey = seisobs.specs.mag_key
-        mags = []
-        for num, row in df1.iterrows(): # iter through 1 lines
-            # first magnitude
-            mtype = magkey.get(row.magtype.upper(), 'M')
-            m1 = self._create_magnitude(row.magnitude, mtype, row.magagency)
-            self._append_mag_if_not_default(mags, m1)
-            # second magnitude
-            mtype = magkey.get(row.mag2type.upper(), 'M')
-            m2 = self._create_magnitude(row.magnitude2, mtype, row.mag2agency)
-            self._append_mag_if_not_default(mags, m2)         
-            # third magnitude
-            mtype = magkey.get(row.mag3type.upper(), 'M')
-            m3 = self._create_magnitude(row.magnitude3, mtype, row.mag3agency)
-            self._append_mag_if_not_default(mags, m3)           
-        return mags 
+        # ravel (line, triple) arrays so order stays m1, m2, m3 of each line
+        mags = np.column_stack([df1.magnitude, df1.magnitude2, 
+                                df1.magnitude3]).ravel()
+        mtypes = np.column_stack([df1.magtype, df1.mag2type, 
+                                  df1.mag3type]).ravel()
+        agencies = np.column_stack([df1.magagency, df1.mag2agency, 
+                                    df1.mag3agency]).ravel()
+        mtypes = np.array([magkey.get(x.upper(), 'M') for x in mtypes], 
+                          dtype=object)
+        # a default magnitude is 0.0 of generic type M with no agency 
+        default = (mags == 0.0) & (agencies == '') & (mtypes == 'M')
+        keep = ~default
+        return [self._create_magnitude(mag, mtype, agency) for mag, mtype, 
+                agency in zip(mags[keep], mtypes[keep], agencies[keep])]
     
     def _create_magnitude(self, mag, mag_type, mag_agency):
         madi = {}
@@ -626,17 +785,6 @@ class Seisob(object):
         madi['magnitude_type'] = mag_type
         madi['creation_info'] = self._creation_info_generic(mag_agency)
         return obspy.core.event.Magnitude(**madi)
-        
-    def _append_mag_if_not_default(self, mags, mag):
-        """
-        decide if mag is defualt (null) magnitude or not. Append to mags
-        if it is a valid mag
-        """
-        con1 =  mag.mag == 0.0
-        con2 = mag.creation_info.agency_id is None
-        con3 = mag.magnitude_type.upper() == 'M'
-        if not (con1 and con2 and con3):
-            mags.append(mag)
 
     def _creation_info_generic(self, agency=None, author=None, time=None):
         crdi = {}
@@ -652,16 +800,22 @@ class Seisob(object):
         """
         Parse the comment lines and return those that have cstr
         """
-        sdf3 = sdf[sdf.linetype=='3']
-        scon = [cstr in x.series.comment for _, x in sdf3.iterrows()]
-        return sdf3[scon]
+        sd3 = sdf2df(sdf, '3', self)
+        scon = sd3['comment'].str.contains(cstr, regex=False, na=False)
+        return sd3[scon.to_numpy(dtype=bool)]
     
     def _get_sfil_from_dir(self, sdir): # parse a sdirectory and yield the s files
-        for root, dirs, files in os.walk(sdir, topdown=False):
-            normpath = os.path.normpath(root)
-            for fil in files:
-                if not fil[-1] == '~' and not '.out' in fil:
-                    yield os.path.join(normpath, fil)
+        # scandir entries cache their type so no extra stat per file is needed
+        # like os.walk, linked dirs are not entered but linked files are kept
+        with os.scandir(sdir) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._get_sfil_from_dir(entry.path)
+                elif entry.is_file():
+                    # only names that are s-files, skips backups (~, .sebk) 
+                    # and .out files without opening them
+                    if _SFILE_NAME_RE.match(entry.name):
+                        yield entry.path
     
     def _validate_sdf(self, sdf, sfile):
         """
@@ -677,6 +831,30 @@ class Seisob(object):
             msg = 'sfile %s does not begin with a lintype 1 entry' % sfile
             raise ValueError(msg)
     
+    def _drop_bad_values(self, rows, sfile):
+        """
+        Validate only the type 1 and I lines, used in place of the line by 
+        line validation when self.validate is False. Takes and returns the 
+        (linetype, row) tuples of an s-file, lines that fail are dropped as 
+        they would be when validating. There are only a few of these lines 
+        in an s-file, and their values (times, lat/lon, ID) are needed to 
+        build the event, so they get the full validation
+        """
+        specs = seisobs.specs.specs
+        validators = {ltype: specs[ltype].validate for ltype in ('1', 'I')}
+        out = []
+        for ltype, row in rows:
+            if ltype in validators:
+                try:
+                    validators[ltype](row)
+                except ValueError:
+                    msg = '%s in %s is not a valid line, skipping' % (
+                          row, sfile)
+                    self.warn(msg)
+                    continue
+            out.append((ltype, row))
+        return out
+    
     def gen_resource_id(self, sdf, id_type):
         """
         Function to generate a resource ID
@@ -701,6 +879,15 @@ class Seisob(object):
         utc += sec
         return utc
     
+    def _get_utcs(self, df1): # utc objects for all rows of a one line df
+        if not len(df1):
+            return []
+        days = pd.to_datetime(df1[['year', 'month', 'day']].astype(int))
+        secs = (df1['hour'].astype(int) * 3600 + df1['minute'].astype(int) * 60
+                + df1['second'].astype(float))
+        times = days + pd.to_timedelta(secs, unit='s')
+        return [obspy.UTCDateTime(ns=int(ns)) for ns in times.to_numpy('int64')]
+    
     def _get_utc_from_I(self, seri):
         utc = obspy.core.UTCDateTime(seri.ID)
         return utc
@@ -748,7 +935,7 @@ class Sline(object):
             try: # try loading and validating 
                 self.sseries = self._load_sline(sline, ltype)
                 seisobs.specs.specs[ltype].validate(self.sseries)
-                
+                validate = False # passed above, dont validate it twice
             except ValueError: #if this is really ment to be line 1
                 msg = (('%s was assigned to linetype 4 but raised error, '
                         'trying linetype 1') % sline)
@@ -757,8 +944,10 @@ class Sline(object):
                 else:
                     self.seiob.warn(msg)
                 ltype = '1'
+                self.slinetype = ltype # file the row under its real type
                 self.sseries = self._load_sline(sline, ltype)
-            self.sseries.linetype = ltype # set linetyp in series
+                validate = True # only a guess, always check it
+            self.sseries = self.sseries._replace(linetype=ltype)
         else:
             self.sseries = self._load_sline(sline, ltype)
             
@@ -767,17 +956,10 @@ class Sline(object):
             seisobs.specs.specs[ltype].validate(self.sseries)
 
     def _load_sline(self, sline, ltype):
-        try:
-            spec = seisobs.specs.specs[ltype]
-        except KeyError:
+        if ltype not in seisobs.specs.specs:
             msg = '%s is not a supported line type of line %s' % (ltype, sline)
             raise KeyError(msg)
-        sseries = pd.Series(index=spec.colname)
-        for sp, na, fo in spec:
-            str_val = sline[sp[0]:sp[1]]
-            sc = seisobs.specs.get_string_converter(fo)
-            sseries[na] = sc(str_val)            
-        return sseries
+        return _parse_sline(sline, ltype)
             
 
     def _classify_line(self, sline):
@@ -795,33 +977,6 @@ class Sline(object):
         else:
             return sline[79]
             
-    def load_sfile_stream(self, arg):
-        """
-        Function to load the seisan file linked to an s-file into an obspy 
-        stream
-        
-        arg : str, df, or Sline instance
-            arg can be either a path to an s-file, a dataframe created with 
-            the load_sfile_into_df function
-        
-        Returns
-        --------
-        An obspy Stream object
-        """
-        if isinstance(arg, text):
-            df = self.load_sfile_into_df(arg)
-        if isinstance(arg, pd.DataFrame):
-            df = arg
-        df6 = sdf2df(df, '6', self)
-        if len(df6) != 1:
-            msg = 'Exactly one line 6 is required, more or less were found'
-            raise ValueError(msg)
-        ser = df6.iloc[0].series
-        path = ser.comment[:-1].rsplit()
-        
-        st = obspy.read(path)
-        return st
-        
     def __bool__(self):
          return (self.slinetype is not None) and (self.sseries is not None)
     
@@ -833,6 +988,39 @@ class Sline(object):
 
 #### misc functions
 
+# s-file names are dd-hhmm-ssX.Syyyymm where X is the distance code
+_SFILE_RE = re.compile(r'^(\d{2})-(\d{2})(\d{2})-(\d{2})\w\.S(\d{4})(\d{2})')
+_SFILE_NAME_RE = re.compile(_SFILE_RE.pattern + '$') # the whole name
+
+@lru_cache(maxsize=4096) # the same name is parsed several times per s-file
+def _utc_from_sfile_name(basename):
+    match = _SFILE_RE.match(basename)
+    if match is None:
+        msg = '%s is not named like an s-file (dd-hhmm-ssX.Syyyymm)' % basename
+        raise ValueError(msg)
+    day, hour, minute, second, year, month = map(int, match.groups())
+    return obspy.UTCDateTime(year=year, month=month, day=day, hour=hour, 
+                             minute=minute, second=second)
+
+def _utc_fname(utc): # utc as yyyy-mm-ddThh-mm-ss, safe for file names
+    return '%04d-%02d-%02dT%02d-%02d-%02d' % (utc.year, utc.month, utc.day,
+                                              utc.hour, utc.minute, utc.second)
+
+@lru_cache(maxsize=4096) # header and blank lines repeat in every s-file
+def _parse_sline(sline, ltype): # rows are immutable so they can be shared
+    return seisobs.specs.specs[ltype].parse(sline)
+
+## Worker process helpers for Seisob._map_sfiles
+
+_worker_seisob = None # the Seisob instance of a worker process
+
+def _init_worker(config):
+    global _worker_seisob
+    _worker_seisob = Seisob(**config)
+
+def _run_worker(method, sfile, kwargs):
+    return getattr(_worker_seisob, method)(sfile, **kwargs)
+
 def sdf2df(sdf, linetype, seisob=None):
     """
     Take the seisan data frame, which has two columns: linetype and series, 
@@ -844,13 +1032,14 @@ def sdf2df(sdf, linetype, seisob=None):
     linetype : str
         The linetype to use in collapsing into single dataframe
     seisob : None or instance of Seisob
-        Used for caching results to avoid redundant calculations
+        Used for caching results to avoid redundant calculations, the cache
+        is only used if it was primed with this sdf
     
     Returns
     -------
     A dataframe with the columns being the indicies of linetype selected
     """
-    if isinstance(seisob, Seisob):
+    if isinstance(seisob, Seisob) and seisob._cache_sdf is sdf:
         if linetype in seisob.df_cache:
             return seisob.df_cache[linetype]
         else:
@@ -860,45 +1049,79 @@ def sdf2df(sdf, linetype, seisob=None):
     else:
         return _sdf2df_helper(sdf, linetype)
 
+_empty_dfs = {} # shared empty dataframes for linetypes not in an s-file
+def _empty_df(linetype):
+    if linetype not in _empty_dfs:
+        cols = seisobs.specs.specs[linetype].colname
+        _empty_dfs[linetype] = pd.DataFrame(columns=cols)
+    return _empty_dfs[linetype]
+
 def _sdf2df_helper(sdf, linetype):    
-    sdflt = sdf[sdf.linetype == linetype]
-    cols = seisobs.specs.specs[linetype].colname
-    df = pd.DataFrame(columns=cols)
-    for ind, row in sdflt.iterrows():
-        df.loc[len(df)] = row.series
-    return df
+    return _rows2df(sdf.series[sdf.linetype == linetype], linetype)
+
+def _rows2df(rows, linetype): # build the dataframe of a linetype's rows
+    spec = seisobs.specs.specs[linetype]
+    return pd.DataFrame(list(rows), columns=spec.colname, dtype=object)
     
 ## Assign_wfid_methods, four functions for getting nslc codes
 
-def get_nslc_from_comment(ser4=None, scnldf=None, **kwargs):
-    con1 = scnldf.station == ser4.station
-    con2 = scnldf.channel.str.contains(ser4.component)
-    tdf = scnldf[con1 & con2]
-    if len(tdf) < 1:
+def get_nslc_from_comment(ser4=None, scnldf=None, scnl_index=None, 
+                          **kwargs):
+    if scnl_index is not None: 
+        nslcs = scnl_index.get((ser4.station, ser4.component), [])
+    else:
+        con1 = scnldf.station == ser4.station
+        con2 = scnldf.channel.str.contains(ser4.component)
+        tdf = scnldf[con1 & con2]
+        nslcs = list(zip(tdf.network, tdf.station, tdf.location, tdf.channel))
+    if len(nslcs) < 1:
         msg = (('No matching scnl found in comments for station '
                 ' %s component %s') % (ser4.station, ser4.component))
         raise ValueError(msg)
-    if len(tdf) > 1:
+    if len(nslcs) > 1:
         msg = 'More than one matching scnl found, using first'
         warnings.warn(msg)
-    ser = tdf.iloc[0]
-    return ser.network, ser.station, ser.location, ser.channel
-
-def get_nslc_from_inventory(ser4=None, nslcdf=None, seiob=None, **kwargs):
-    con1 = nslcdf.station==ser4.station
-    con2 = nslcdf.station.str.contains(ser4.station)
-    tdf = nslcdf[con1 & con2]
-    if len(tdf) < 1:
+    return nslcs[0]
+
+def _scnl_index(scnldf): 
+    """
+    Map (station, any substring of channel) to the nslc codes of the comment
+    lines, in order. Gives the same matches as the channel.str.contains
+    component search in get_nslc_from_comment with one dict lookup
+    """
+    index = {}
+    for sta, cha, net, loc in scnldf.itertuples(index=False):
+        subs = {cha[start:stop] for start in range(len(cha)) 
+                for stop in range(start + 1, len(cha) + 1)}
+        for sub in subs:
+            index.setdefault((sta, sub), []).append((net, sta, loc, cha))
+    return index
+
+def get_nslc_from_inventory(ser4=None, nslcdf=None, seiob=None, 
+                            nslc_index=None, station_index=None, **kwargs):
+    if nslc_index is not None: # exact station and component match
+        nslc = nslc_index.get((ser4.station, ser4.component[-1:]))
+        if nslc is not None:
+            return nslc
+    if station_index is not None:
+        nslc = station_index.get(ser4.station)
+        nslcs = [] if nslc is None else [nslc]
+    else:
+        tdf = nslcdf[nslcdf.station == ser4.station]
+        nslcs = list(zip(tdf.network, tdf.station, tdf.location, tdf.channel))
+        for nslc in nslcs:
+            if nslc[3][-1:] == ser4.component[-1:]:
+                return nslc
+    if len(nslcs) < 1:
         msg = 'No matching scnl found'
         raise ValueError(msg)
-    if len(tdf) > 1:
-        msg = 'More than one matching scnl found, using first'
-        if seiob is None:
-            warnings.warn(msg)
-        else:
-            seiob.warn(msg)
-    ser = tdf.iloc[0]     
-    return ser.network, ser.station, ser.location, ser.channel
+    msg = 'No channel of %s matches component %s, using first channel' % (
+           ser4.station, ser4.component)
+    if seiob is None:
+        warnings.warn(msg)
+    else:
+        seiob.warn(msg)
+    return nslcs[0]
 
 def get_nscl_from_waveform(ser4=None, st=None, **kwargs):
     st1 = st.select(station=ser4.station, component=ser4.component)
@@ -910,7 +1133,7 @@ def get_nscl_from_waveform(ser4=None, st=None, **kwargs):
         msg = (('More than one channel meet requirements in stream' 
                 '%s assuming first channel is correct') % st)
         warnings.warn(msg)
-    tr = st[0]
+    tr = st1[0]
     net, sta = tr.stats.network, tr.stats.station
     loc, cha = tr.stats.location, tr.stats.channel
     return net, sta, loc, cha
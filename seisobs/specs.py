@@ -8,9 +8,12 @@ Contains specs for seisan format taken from:
 http://seis.geus.net/software/seisan/seisan.pdf appendix A
 """
 
+import calendar
+import collections
+import copyreg
+import re
+import sys
 import warnings
-import obspy
-import sys  
 
 ##### Define important line types for various objects
 
@@ -37,9 +40,18 @@ class Spec(object):
     colformat : list
         list of format strings for python types in each field
     validate_method : function
-        A validation method for the series created by seisobs.core.Sline,
-        takes a series as input with indicies as colnames. Should raise 
-        exceptions or warnings
+        A validation method for the row created by seisobs.core.Sline,
+        takes a row (namedtuple with colnames as fields) as input. Should
+        raise exceptions or warnings
+    
+    Attributes
+    rowtype : namedtuple class
+        The row type for parsed lines, fields are the colnames
+    converters : tuple
+        The StringConverter for each field, built on first use
+    parse : function
+        Called with a line, returns a rowtype of the converted fields. 
+        Generated for the spec on first use
     """
     def __init__(self, colspec, colname, colformat, validate_method):
         
@@ -50,10 +62,63 @@ class Spec(object):
         self.colname = colname
         self.colformat = colformat
         self.validate = validate_method
+        self.rowtype = _get_rowtype(colname)
+        self._fields = tuple(zip(colspec, colname, colformat))
+        self._blank_cols = tuple(na for na in colname if na.startswith('bla'))
+        self._converters = None
+        self._parse = None
+    
+    @property
+    def converters(self): # converters are defined below the specs, get lazily
+        if self._converters is None:
+            self._converters = tuple(get_string_converter(fo) 
+                                     for fo in self.colformat)
+        return self._converters
+    
+    @property
+    def parse(self):
+        if self._parse is None:
+            self._parse = _make_parser(self)
+        return self._parse
     
     def __iter__ (self): # itter through zipped col info
-        for sp, na, fo in zip(self.colspec, self.colname, self.colformat):
-            yield sp, na, fo
+        return iter(self._fields)
+
+_rowtypes = {} # row namedtuple classes keyed on their fields
+def _get_rowtype(colname):
+    """
+    Get the row namedtuple class for colname. Specs with the same columns 
+    share a class, and each class is registered with copyreg so rows can 
+    be pickled (the classes are made at runtime so pickle cant import them)
+    """
+    fields = tuple(colname)
+    if fields not in _rowtypes:
+        rowtype = collections.namedtuple('SRow', fields)
+        copyreg.pickle(rowtype, _reduce_row)
+        _rowtypes[fields] = rowtype
+    return _rowtypes[fields]
+
+def _reduce_row(row):
+    return _make_row, (row._fields, tuple(row))
+
+def _make_row(fields, values):
+    return _get_rowtype(fields)._make(values)
+
+def _make_parser(spec):
+    """
+    Write and compile a parse function for spec with the slices as literals
+    and the converters bound as default args, so parsing a line is a single
+    call with no loop, zip or attribute lookups
+    """
+    args = ''.join(', _c%d=_convs[%d]' % (num, num) 
+                   for num in range(len(spec.colspec)))
+    fields = ', '.join('_c%d(line[%d:%d])' % (num, sp[0], sp[1]) 
+                       for num, (sp, na, fo) in enumerate(spec))
+    src = 'def parse(line, _make=_make%s):\n    return _make((%s,))\n'
+    convs = tuple(conv.from_str for conv in spec.converters)
+    namespace = {'_make': spec.rowtype._make, '_convs': convs}
+    exec(src % (args, fields), namespace)
+    return namespace['parse']
 
 ###### Define formats
 
@@ -71,20 +136,20 @@ cn1 = ['bla1', 'year', 'bla2', 'month', 'day', 'fixotime', 'hour', 'minute',
        'magnitude', 'magtype', 'magagency', 'magnitude2', 'mag2type', 'mag2agency',
        'magnitude3', 'mag3type', 'mag3agency', 'linetype']
 cf1 = ['%-s', '%4d', '%s', '%2d', '%2d', '%1s', '%2d', '%2d', '%s', '%4.1f', '%1s',
-       '%1s', '%1s', '%7.3f', '%8.3f', '%5.1f', '%1s', '%1s', '%-3s', '3d%', '%4.2f',
+       '%1s', '%1s', '%7.3f', '%8.3f', '%5.1f', '%1s', '%1s', '%-3s', '%3d', '%4.2f',
        '%4.1f', '%1s', '%3s', '%4.1f', '%1s', '%3s', '%4.1f', '%1s', '%3s', '%1s']
 
 def validate1(ser):
     """
     Validation methods for linetype 1
     """
-    if not set(cn1).issubset(ser.index):
-        msg = 'series does not have correct indicies'
+    if not set(cn1).issubset(ser._fields):
+        msg = 'row does not have correct fields'
         raise ValueError(msg)
     validate_mag(ser)
     validate_lat_lon(ser)
     validate_utc(ser)
-    validate_blanks(ser)
+    validate_blanks(ser, specs['1']._blank_cols)
     validate_year(ser)
     
 specs['1'] = Spec(cs1, cn1, cf1, validate1)
@@ -103,8 +168,8 @@ def validate3(ser):
     pass # nothing to see here folks, move along
     
 specs['3'] = Spec(cs3, cn3, cf3, validate3)
-for ltype in lines_not_used:
-    specs[ltype] = Spec(cs3, cn3, cf3, validate3)
+for ltype in lines_not_used: # same layout, share the spec (and its parser)
+    specs[ltype] = specs['3']
 
 
 
@@ -120,14 +185,15 @@ cn4 = ['bla1', 'station', 'instrumenttype', 'component', 'bla2', 'qualityindicat
        'bla7', 'phasevelocity', 'incidenceangle', 'azimuthresid', 'traveltimeresid',
        'weight2', 'distance', 'bla8', 'azimuth', 'linetype']
 cf4 = ['%s', '%-5s', '%s', '%s', '%s', '%s', '%4s', '%d', '%s', '%s', '%s', '%2d',
-       '%2d', '%6.2f', '%s', '%4d', '%f7.1', '%s', '%4.2f', '%s', '%5.1f', '%s',
+       '%2d', '%6.2f', '%s', '%4d', '%7.1f', '%s', '%4.2f', '%s', '%5.1f', '%s',
        '%4.0f','%4.0f', '%3d', '%5.1f', '%2d', '%5.0f', '%s', '%3d', '%s']
 
 def validate4(ser):
-    if not set(cn4).issubset(ser.index):
-        msg = 'series does not have correct indicies'
+    if not set(cn4).issubset(ser._fields):
+        msg = 'row does not have correct fields'
         raise ValueError(msg) 
-    if ser.azimuth < 0 or ser.azimuth > 360:
+    # non-numeric text (eg the agency of a type 1 line) converts to None
+    if ser.azimuth is None or ser.azimuth < 0 or ser.azimuth > 360:
         msg = 'invalid azimuth found in series'
         raise ValueError(msg)
     if len(ser.station.strip()) == 0:
@@ -137,7 +203,7 @@ def validate4(ser):
         msg = 'No component field found in series'
         raise ValueError(msg)    
     validate_utc(ser, ymd=False)
-    validate_blanks(ser)
+    validate_blanks(ser, specs['4']._blank_cols)
 
 specs['4'] = Spec(cs4, cn4, cf4, validate4)
 
@@ -152,8 +218,8 @@ cfe = ['%s', '%4s', '%3d', '%6.2f', '%6.1f', '%1s', '%6.1f', '%5.1f', '%12.4E',
        '%12.4E', '%12.4E', '%1s']
 
 def validatee(ser):
-    if not set(cne).issubset(ser.index):
-        msg = 'series does not have correct indicies'    
+    if not set(cne).issubset(ser._fields):
+        msg = 'row does not have correct fields'    
         raise ValueError(msg)
 
 specs['E'] = Spec(cse, cne, cfe, validatee)
@@ -165,8 +231,8 @@ csh = [(0,1), (1,5), (5,6), (6,8), (8,10), (10,11), (11,13), (13,15), (15,16),
        (16,22), (22,23), (23,32), (32,33), (33,43), (43,44), (44,52), (52,53),
         (53,59), (59,79), (79,80)]
 cnh = ['bla1', 'year', 'bla2', 'month', 'day', 'fixotime', 'hour', 'minute', 
-       'bla2', 'second', 'bla3', 'latitude', 'bla4', 'longitude', 'bla5', 'depth',
-       'bla6', 'rms', 'bla7', 'linetype']
+       'bla3', 'second', 'bla4', 'latitude', 'bla5', 'longitude', 'bla6', 'depth',
+       'bla7', 'rms', 'bla8', 'linetype']
 cfh = ['%-s', '%4d', '%s', '%2d', '%2d', '%1s', '%2d', '%2d', '%s', '%6.3f', 
        '%s', '%9.5f', '%s', '%10.5f', '%s', '%8.3f', '%s', '%6.3f', '%s', '%s']
 
@@ -181,15 +247,16 @@ csi = [(0,1), (1,8), (8,11), (11,12), (12,26), (26,27), (27,30), (30,35),(35,42)
         (79,80)]
 cni = ['bla1', 'actionhelp', 'action', 'bla2', 'actiondatetime', 'bla3', 
        'textophelpoperator', 'operator', 'texthelpstatus',
-       'statusflag', 'bla5', 'IDtext', 'ID', 'newflag', 'lock',  
-       'bla6', 'linetype']
+       'statusflag', 'unused1', 'IDtext', 'ID', 'newflag', 'lock',  
+       'unused2', 'linetype']
 cfi = ['%s', '%-7s', '%-3s', '%s', '%-14s', '%1s', '%3s', '%5s', '%7s','%13s', 
        '%1s', '%3s', '%14s', '%1s', '%1s', '%3s', '%1s']
 
 def validatei(ser):
-    validate_blanks(ser)
+    from obspy import UTCDateTime # obspy only needed once lines are validated
+    validate_blanks(ser, specs['I']._blank_cols)
     try:
-        utc = obspy.UTCDateTime(ser.ID)
+        utc = UTCDateTime(ser.ID)
     except (ValueError, TypeError):
         msg = 'The following ID found in line is not a utcdatetime %s' % ser.ID
         raise ValueError(msg)
@@ -203,7 +270,7 @@ cn0 = ['bla1', 'linetype']
 cf0 = ['%-s', '%1s']
 
 def validate0(ser):
-    validate_blanks(ser)
+    validate_blanks(ser, specs['0']._blank_cols)
     
 specs['0'] = Spec(cs0, cn0, cf0, validate0)
 
@@ -214,12 +281,12 @@ csf = [(0,10), (10,20), (20,30), (30,35), (35,40), (40,45), (45,50), (50,55),
         (79,80)]
 cnf = ['strike', 'dip', 'rake', 'strikeerror', 'diperror', 'rakeerror', 'fiterror',
        'stationdistratio', 'amplituderatio', 'numbadpolarity', 'unused', 
-       'numbadamplitudes', 'agency', 'program', 'quality', 'bla2', 'linetype']
+       'numbadamplitudes', 'agency', 'program', 'quality', 'userflag', 'linetype']
 cff = ['%10.0f', '%10.0f', '%10.0f', '%5.1f', '%5.1f', '%5.1f', '%5.1f', '%5.1f', 
        '%5.1f', '%2d', '%s', '%2d', '%-3s', '%-7s', '%1s', '%1s' ,'%1s']
 
 def validatef(ser):
-    validate_blanks(ser)
+    validate_blanks(ser, specs['F']._blank_cols)
     if ser.strike > 360 or ser.strike < 0:
         msg = '%d is an invalid strike' % ser.strike
         raise ValueError(msg)
@@ -236,34 +303,39 @@ def validate_utc(ser, ymd=True, hms=True):
     ds1 = ['year', 'month', 'day']
     ds2 = ['hour', 'minute', 'second']
     if ymd:
-        if not set(ds1).issubset(ser.index):
-            msg = 'Series does not have all %s' % str(ds1)
+        if not set(ds1).issubset(ser._fields):
+            msg = 'Row does not have all %s' % str(ds1)
             raise ValueError(msg)
     if hms:
-        if not set(ds2).issubset(ser.index):
-            msg = 'Series does not have all %s' % str(ds2)
+        if not set(ds2).issubset(ser._fields):
+            msg = 'Row does not have all %s' % str(ds2)
             raise ValueError(msg)
             
-    utc = obspy.UTCDateTime(year=2015, month=01, day=15)
+    # range checks only, building a UTCDateTime per line is too slow
     try:
         if ymd:
-            utc.year = ser.year
-            utc.month = ser.month
-            utc.day = ser.day
+            if ser.year < 1 or ser.year > 9999:
+                raise ValueError('Year must be between 1 and 9999')
+            if ser.month < 1 or ser.month > 12:
+                raise ValueError('Month must be between 1 and 12')
+            if ser.day < 1 or ser.day > calendar.monthrange(ser.year, 
+                                                            ser.month)[1]:
+                raise ValueError('Day is out of range for month')
         if hms:
             if ser.hour < 0 or ser.hour > 48:
                 raise ValueError('Hour must be between 0 and 48')
-            utc.minute = ser.minute
-            utc.second = int(ser.second)
-            utc += ser.second - int(ser.second)
-    except (ValueError, TypeError), e:
+            if ser.minute < 0 or ser.minute > 59:
+                raise ValueError('Minute must be between 0 and 59')
+            if int(ser.second) < 0 or int(ser.second) > 59:
+                raise ValueError('Second must be between 0 and 59')
+    except (ValueError, TypeError) as e:
         msg = 'Invalid time value found in series, %s' % e
         raise ValueError(msg)
 
 def validate_lat_lon(ser):
     ll = ['latitude', 'longitude']
-    if not set(ll).issubset(ser.index):
-        msg = 'Series does not have all %s' % str(ll)
+    if not set(ll).issubset(ser._fields):
+        msg = 'Row does not have all %s' % str(ll)
         raise ValueError(msg)
     if abs(ser.latitude) > 90:
         msg = '%f is an invalid latitude value' % ser.latitude
@@ -273,23 +345,19 @@ def validate_lat_lon(ser):
         raise ValueError(msg)        
 
 def validate_mag(ser):
-    if not 'magnitude' in ser.index:
-        msg = 'Series does not have magnitude in its index'
+    if not 'magnitude' in ser._fields:
+        msg = 'Row does not have a magnitude field'
         raise ValueError(msg)
     if not ser.magnitude < 10.0:
         msg = 'mag is probably wrong (>10), else God help us all'
         raise ValueError(msg)
 
-def validate_blanks(ser):
-    blanks =('bla%d' % d for d in xrange(1, 12))
-    for blank in blanks:
-        if blank in ser.index:
-            blastr = ser[blank].strip()
-            if len(blastr) > 0:
-                msg = '%s was found in blank string on series' % blastr
-                raise ValueError(msg)
-        else: # blanks are sequential, if we reach the end get off the train
-            return
+def validate_blanks(ser, blank_cols):
+    for blank in blank_cols: # the spec's blank columns, found once
+        blastr = getattr(ser, blank).strip()
+        if len(blastr) > 0:
+            msg = '%s was found in blank string on series' % blastr
+            raise ValueError(msg)
 
 def validate_year(ser):
     if int(ser.year) < 1910:
@@ -319,6 +387,9 @@ def get_string_converter(fmtstr):
         return string_converters[fmtstr]
 
   
+# one % followed by optional flag, width and precision and a single type char
+_FMT_RE = re.compile(r'^%-?\d*(\.\d+)?[dfslEe]$')
+
 class StringConverter(object):
     """
     Class for converting between strings and other data types given a format
@@ -330,6 +401,12 @@ class StringConverter(object):
     l is a special character intrepreted by StringConverter that is a float
     without a decimal. So, '%4.2l' % 4 = 0400, this is used by some 
     hypoinverse formats.
+    
+    Attributes
+    ----------
+    from_str : function
+        Converts a field string to the object, same result as calling the
+        instance with a str but without the type dispatch. Used for parsing
     """
     accepted_chars = {'f':float, 's':str, 'd':int, 'e':float, 'l':float, 
                       'E':float}
@@ -340,6 +417,7 @@ class StringConverter(object):
         self.str2obj = _get_str2obj(self, fmtstr)
         if self.char == 'l': # replace l with f for operations
             self.fmtstr = self.fmtstr.replace('l', 'f')
+        self.from_str = _get_from_str(self)
         
     def obj2str(self, obj):
         """
@@ -359,20 +437,10 @@ class StringConverter(object):
         if not isinstance(fmtstr, str):
             msg = 'fmt str argument is not a string, only strings are accepted'
             raise TypeError(msg)
-        if not fmtstr.count('%') == 1:
-            msg = (('There must be exactly one percent sign in the format '
-                    'string %s doesnt have it') % fmtstr)
-            raise ValueError(msg)
-        if not any([x in fmtstr for x in self.accepted_chars]):
-            msg = (('No supported formats found in fmtstr, they are %s') %
-                    self.accepted_chars)
-            raise ValueError(msg)
-        if sum([fmtstr.count(x) for x in self.accepted_chars]) > 1:
-            msg = (('Exactly one format character is required in fmtstr, you '
-                    'passed %s') % fmtstr)
-            raise ValueError(msg)
-        if fmtstr.count('.') > 1:
-            msg = 'fmtstr can only have one decimal, you passed %s' % fmtstr
+        if not _FMT_RE.match(fmtstr):
+            msg = (('fmtstr must be a single %%[-][width][.precision] format '
+                    'ending in one of %s, you passed %s') % 
+                    (''.join(self.accepted_chars), fmtstr))
             raise ValueError(msg)
             
     
@@ -421,9 +489,11 @@ def _get_str2obj(strcnvr, fmtstr):
             full_str = (coninst.fmtstr % obj)
             stripped_str = full_str.strip()     
             if len(obj) > len(stripped_str):
-                return stripped_str
+                out = stripped_str
             else:
-                return full_str
+                out = full_str
+            # codes (station, component, agency...) repeat on many lines
+            return sys.intern(out) if len(out) < 32 else out
             try:
                 return str(obj)
             except TypeError:
@@ -441,6 +511,8 @@ def _get_str2obj(strcnvr, fmtstr):
         
     def str2obj(coninst, obj):
         try:
+            if coninst.divisor == 1: # dont let true division make ints floats
+                return coninst.type(obj)
             return coninst.type(obj)/coninst.divisor
         except TypeError:
             msg = 'str2obj takes exatly one string, you passed %s' % type(obj)
@@ -448,4 +520,45 @@ def _get_str2obj(strcnvr, fmtstr):
         except ValueError:
             if coninst.type == float or coninst.type == int and len(obj.strip()) == 0:
                 return coninst.type(0)
-    return str2obj   
\ No newline at end of file
+    return str2obj
+
+def _get_from_str(strcnvr):
+    """
+    Build a function of one string for strcnvr that gives the same result
+    as str2obj with the type checks, format and division decided here once
+    """
+    fmtstr, divisor = strcnvr.fmtstr, getattr(strcnvr, 'divisor', 1)
+    if strcnvr.type == str:
+        if '.' in fmtstr: # precision may cut the string, use the general path
+            return lambda obj: strcnvr.str2obj(strcnvr, obj)
+        
+        def from_str(obj):
+            stripped_str = obj.strip() # formatting only pads with spaces
+            out = stripped_str if len(obj) > len(stripped_str) else fmtstr % obj
+            return sys.intern(out) if len(out) < 32 else out
+    
+    elif strcnvr.type == int:
+    
+        def from_str(obj):
+            if not obj.strip():
+                return 0
+            try:
+                return int(obj)
+            except ValueError:
+                return None
+    
+    elif divisor == 1:
+    
+        def from_str(obj):
+            try:
+                return float(obj)
+            except ValueError:
+                return 0.0
+    else:
+    
+        def from_str(obj):
+            try:
+                return float(obj) / divisor
+            except ValueError:
+                return 0.0
+    return from_str   
\ No newline at end of file
@@ -1 +1 @@
-0.0.4
+__version__ = "0.0.4"
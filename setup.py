@@ -8,7 +8,7 @@ import os
 
 version_file = os.path.join('seisobs', 'version.py')
 with open(version_file) as vf:
-    __version__ = vf.read().strip()
+    exec(vf.read()) # defines __version__
 
 setup(
     name='seisobs',
@@ -24,9 +24,13 @@ setup(
         'Intended Audience :: Geo-scientists',
         'Topic :: Earthquake metadata conversion',
         'License :: OSI Approved :: MIT License',
-        'Programming Language :: Python :: 2.7',
+        'Programming Language :: Python :: 3',
     ],
     keywords = 'seismology',
+    python_requires = '>=3.9',
     packages = find_packages(exclude=['contrib', 'docs', 'Tests*']),
-    install_requires = ['pytest', 'obspy >= 1.0.0', 'pandas >= 0.17.0']
+    package_data = {'seisobs': ['__init__.pyi']},
+    install_requires = ['numpy', 'obspy >= 1.0.0', 'pandas >= 0.17.0',
+                        'lazy_loader >= 0.1'],
+    extras_require = {'dev': ['pytest']},
 )
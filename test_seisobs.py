@@ -7,11 +7,13 @@ Py.test test framework for seisan2obspy code
 """
 import pytest
 import os
+import numpy as np
 import seisobs
-import ipdb
 import obspy
 import shutil
+from itertools import chain
 from builtins import str as text
+from types import SimpleNamespace
 
 ##### module vars
 
@@ -24,11 +26,13 @@ def walkdir(directory, ext):
     Simple function to walk a directory and yield abs paths to each file if 
     the file has a given extension
     """
-    for root, dirs, files in os.walk(directory, topdown=False):
-        for fil in files:
-            if ext in fil:
-                path = os.path.abspath(root)
-                yield os.path.join(path, fil)
+    # entry paths are joined onto this, so they are already absolute
+    with os.scandir(os.path.abspath(directory)) as entries:
+        for entry in entries: # entries cache their file type
+            if entry.is_dir(follow_symlinks=False):
+                yield from walkdir(entry.path, ext)
+            elif entry.name.endswith(ext):
+                yield entry.path
 
 
 
@@ -37,16 +41,21 @@ file_to_save1 = os.path.join('TEST_', '2000', '02', '01-1242-20L.S200002')
 file_to_save2 = os.path.join('TEST_', '2005', '10', '23-2001-05L.S200510')
 file_to_save3 = os.path.join('TEST_', '2009', '01', '15-1748-56D.S200901')
 
+@pytest.fixture(scope='session')
+def seisob(): # default Seisob shared by the tests that dont configure one
+    return seisobs.core.Seisob()
+
 @pytest.yield_fixture(scope='module')
-def setup_directory_to_save():
-    seiob = seisobs.core.Seisob()
+def setup_directory_to_save(seisob):
     for fts in [file_to_save1, file_to_save2, file_to_save3]:
         npath = fts.replace('TEST_', 'TEST2_')
         ndir = os.path.dirname(npath)
-        if not os.path.exists(ndir):
-            os.makedirs(ndir)
-        shutil.copy2(fts, npath)
-    seiob.seis2disk('TEST2_', savedir='DelXML')
+        os.makedirs(ndir, exist_ok=True)
+        try: # a hard link is enough, the copies are only read
+            os.link(fts, npath)
+        except OSError: # cross device or no link support
+            shutil.copy2(fts, npath)
+    seisob.seis2disk('TEST2_', savedir='DelXML')
     yield
     shutil.rmtree('TEST2_')
     shutil.rmtree('DelXML')
@@ -54,50 +63,47 @@ def setup_directory_to_save():
 def test_directory_from_seis2disk(setup_directory_to_save):
     for fts in [file_to_save1, file_to_save2, file_to_save3]:
         assert os.path.exists(fts)
-    cat = obspy.core.event.Catalog()
+    events = []
     for xml in walkdir('DelXML', '.xml'):
-        cat += obspy.readEvents(xml)
+        events.extend(obspy.read_events(xml).events)
+    cat = obspy.core.event.Catalog(events=events)
     assert isinstance(cat, obspy.core.event.Catalog)
-    assert len(cat) > 0
+    assert len(cat) == 3 # one xml per s-file saved
+
+@pytest.yield_fixture()
+def removable_savedir():
+    dirname = 'DelXML2'
+    yield dirname
+    if os.path.exists(dirname):
+        shutil.rmtree(dirname)
+
+def test_seis2disk_after_savedir_removed(seisob, removable_savedir):
+    for _ in range(2): # the instance must not assume the savedir still exists
+        seisob.seis2disk(file_to_save1, savedir=removable_savedir)
+        assert len(list(walkdir(removable_savedir, '.xml'))) == 1
+        shutil.rmtree(removable_savedir)
 
 #### test inventory to get wid
 file_to_test_inv = os.path.join('TEST_', '2005', '10', '23-2001-05L.S200510')
 stas = ['STOK', 'STOK1', 'STOK2', 'MELS', 'MOR8', 'NSS', 'LOF', 'MOL', 'SUE']
 nets = ['UU']
-chas = ['BHZ', 'BHE', 'BHZ']
+chas = ('BHZ', 'BHE', 'BHN')
+nets_set, stas_set, chas_set = frozenset(nets), frozenset(stas), frozenset(chas)
 
-@pytest.fixture()
+base_cha_kwargs = {'latitude':50.22, 'longitude':-108.78, 'elevation':1000,
+                   'location_code':' ', 'depth':0}
+base_sta_kwargs = {'latitude':50.22, 'longitude':-108.78, 'elevation':1000}
+
+@pytest.fixture(scope='module')
 def get_inventory(): # make fake inventory for stations found in file
-    networks = []
-    for net in nets:
-        sta_list = []
-        for sta in stas:
-            cha_li = []
-            for cha in chas:
-                chdi = {}
-                chdi['latitude'] = 50.22
-                chdi['longitude'] = -108.78
-                chdi['elevation'] = 1000
-                chdi['code'] = cha
-                chdi['location_code'] = ' '
-                chdi['depth'] = 0
-                chan1 = obspy.station.Channel(**chdi)
-                cha_li.append(chan1)
-            stdi = {}
-            stdi['channels'] = cha_li
-            stdi['code'] = sta
-            stdi['latitude'] = 50.22
-            stdi['longitude'] = -108.78
-            stdi['elevation'] = 1000            
-            station = obspy.station.Station(**stdi)
-            sta_list.append(station)
-        nedi = {}
-        nedi['code'] = net
-        nedi['stations'] = sta_list
-        network = obspy.station.Network(**nedi)
-        networks.append(network)
-    inventory = obspy.station.Inventory(networks=networks, source='Made_Up')
-    return inventory
+    inv = obspy.core.inventory
+    networks = [inv.Network(code=net, stations=[
+                    inv.Station(code=sta, channels=[
+                        inv.Channel(code=cha, **base_cha_kwargs) 
+                        for cha in chas], **base_sta_kwargs)
+                    for sta in stas])
+                for net in nets]
+    return inv.Inventory(networks=networks, source='Made_Up')
 
 def test_inventory_get_wid(get_inventory):
     inv = get_inventory
@@ -105,10 +111,43 @@ def test_inventory_get_wid(get_inventory):
     cat = so.seis2cat(file_to_test_inv)
     for pick in cat[0].picks:
         wid = pick.waveform_id
-        assert wid.network_code in nets
-        assert wid.station_code in stas
-        assert wid.channel_code in chas
-    #assert 
+        assert wid.network_code in nets_set
+        assert wid.station_code in stas_set
+        assert wid.channel_code in chas_set
+    # the file only has Z and E picks, each should get its own channel
+    assert {pick.waveform_id.channel_code for pick in cat[0].picks} == {
+        'BHZ', 'BHE'}
+
+#### test waveform to get wid
+@pytest.fixture()
+def sfile_with_waveform(tmp_path): # s-file whose line 6 points at a mseed file
+    stream = obspy.Stream()
+    for sta in stas:
+        for comp in 'ZEN':
+            header = {'network':'NS', 'station':sta, 'channel':'HH' + comp,
+                      'starttime':obspy.UTCDateTime(2005, 10, 23, 20)}
+            stream.append(obspy.Trace(np.zeros(100, dtype=np.int32), header))
+    wavefile = os.path.join(str(tmp_path), 'wav.mseed')
+    stream.write(wavefile, format='MSEED')
+    assert len(wavefile) <= 78 # has to fit in the line
+    sfile = os.path.join(str(tmp_path), os.path.basename(file_to_test_inv))
+    with open(file_to_test_inv, encoding='latin-1') as fi:
+        lines = fi.readlines()
+    with open(sfile, 'w', encoding='latin-1') as fi:
+        for line in lines:
+            if line[79:80] == '6':
+                line = ' %-78s6\n' % wavefile
+            fi.write(line)
+    return sfile
+
+def test_waveform_get_wid(sfile_with_waveform):
+    cat = seisobs.core.seis2cat(sfile_with_waveform)
+    cat_no_wav = seisobs.core.seis2cat(file_to_test_inv)
+    for pick, pick_no_wav in zip(cat[0].picks, cat_no_wav[0].picks):
+        wid = pick.waveform_id
+        assert wid.network_code == 'NS'
+        assert wid.station_code == pick_no_wav.waveform_id.station_code
+        assert wid.channel_code == 'HH' + pick_no_wav.waveform_id.channel_code[-1]
 
 
 #### End to End tests
@@ -118,8 +157,21 @@ def test_inventory_get_wid(get_inventory):
 cattars = ['events']
 
 @pytest.fixture(scope='module')
-def get_cat():
-    return seisobs.core.seis2cat(test_dir)
+def get_cat(seisob):
+    return seisob.seis2cat(test_dir)
+
+@pytest.fixture(scope='module')
+def parsed_catalog(get_cat): # flatten the catalog once for the fixtures below
+    events = tuple(get_cat) # tuples, these are shared by the whole module
+    flat = chain.from_iterable
+    origins = tuple(flat(event.origins for event in events))
+    return SimpleNamespace(
+        cat=get_cat, events=events, origins=origins, 
+        arrivals=tuple(flat(origin.arrivals for origin in origins)),
+        picks=tuple(flat(event.picks for event in events)),
+        mags=tuple(flat(event.magnitudes for event in events)),
+        amplitudes=tuple(flat(event.amplitudes for event in events)),
+        comments=tuple(flat(event.comments for event in events)))
 
 @pytest.yield_fixture(scope='module')
 def create_blank_directory():
@@ -128,32 +180,93 @@ def create_blank_directory():
     if os.path.exists(dirname):
         shutil.rmtree(dirname)
 
+@pytest.yield_fixture(scope='module')
+def create_cache_directory():
+    dirname = 'Delete_me_cache'
+    yield dirname
+    if os.path.exists(dirname):
+        shutil.rmtree(dirname)
+
 class Test_S2OB_catalog:
     def test_type(self, get_cat):
         cat = get_cat
         assert isinstance(cat, obspy.core.event.Catalog) 
         assert len(cat) > 1
-    def test_no_sfiles(self, create_blank_directory):
+    def test_no_sfiles(self, seisob, create_blank_directory):
         with pytest.raises(ValueError):
-            seiob = seisobs.Seisob()
-            seiob.seis2cat(create_blank_directory)
+            seisob.seis2cat(create_blank_directory)
+    def test_workers(self, get_cat):
+        cat = seisobs.core.seis2cat(test_dir, workers=2)
+        assert len(cat) == len(get_cat)
+        for eve in cat:
+            if len(eve.origins): # preferred ids survive the trip between procs
+                assert isinstance(eve.preferred_origin(), obspy.core.event.Origin)
+    def test_cache_dir(self, get_cat, create_cache_directory):
+        seiob = seisobs.Seisob(cache_dir=create_cache_directory)
+        cat1 = seiob.seis2cat(test_dir)
+        assert len(os.listdir(create_cache_directory)) == len(get_cat)
+        cat2 = seiob.seis2cat(test_dir) # now read from the cache
+        assert len(cat1) == len(cat2) == len(get_cat)
+        for eve1, eve2 in zip(cat1, cat2):
+            assert len(eve1.picks) == len(eve2.picks)
+    def test_symlinked_sfile(self, seisob, tmp_path):
+        link = os.path.join(str(tmp_path), os.path.basename(file_to_save1))
+        try:
+            os.symlink(os.path.abspath(file_to_save1), link)
+        except (OSError, NotImplementedError):
+            pytest.skip('symlinks not supported here')
+        assert len(seisob.seis2cat(str(tmp_path))) == 1
+    def test_blank_linetype_header(self, seisob, tmp_path):
+        with open(file_to_save1, encoding='latin-1') as fi:
+            line1, rest = fi.readline(), fi.read()
+        sfile = os.path.join(str(tmp_path), os.path.basename(file_to_save1))
+        with open(sfile, 'w', encoding='latin-1') as fi: # blank column 80
+            fi.write(line1[:79] + ' \n' + rest)
+        eve, = seisob.seis2cat(sfile)
+        eve_ref, = seisob.seis2cat(file_to_save1)
+        assert eve.origins[0].time == eve_ref.origins[0].time
+        assert len(eve.picks) == len(eve_ref.picks)
+    def test_get_comments_after_event(self, seisob):
+        seisob.seis2cat(file_to_save1) # has a comment line
+        sdf = seisob.load_sfile_into_df(file_to_save2) # has none
+        assert seisob.get_comments(sdf) == []
+    def test_no_validate(self, get_cat, tmp_path):
+        cat = seisobs.Seisob(validate=False).seis2cat(test_dir)
+        assert len(cat) == len(get_cat)
+        for eve1, eve2 in zip(cat, get_cat):
+            assert len(eve1.origins) == len(eve2.origins)
+            assert len(eve1.picks) == len(eve2.picks)
+        # type 1 lines with a bad month, year or second are still skipped
+        with open(file_to_save1, encoding='latin-1') as fi:
+            line1, rest = fi.readline(), fi.read()
+        bad_line1s = [line1[:6] + '13' + line1[8:], ' 20x0' + line1[5:], 
+                      line1[:16] + '75.0' + line1[20:]]
+        sfile = os.path.join(str(tmp_path), os.path.basename(file_to_save1))
+        for bad_line1 in bad_line1s:
+            with open(sfile, 'w', encoding='latin-1') as fi:
+                fi.write(bad_line1 + rest)
+            for validate in [True, False]:
+                cat = seisobs.Seisob(validate=validate).seis2cat(sfile)
+                assert len(cat) == 0
+        # as is an I line with a garbled ID, the event is kept without it
+        lines = (line1 + rest).splitlines(True)
+        ind = [line[79:80] for line in lines].index('I')
+        lines[ind] = lines[ind][:60] + 'x' * 14 + lines[ind][74:]
+        with open(sfile, 'w', encoding='latin-1') as fi:
+            fi.write(''.join(lines))
+        for validate in [True, False]:
+            cat = seisobs.Seisob(validate=validate).seis2cat(sfile)
+            assert len(cat) == 1
             
 ######## test events
 
 @pytest.fixture(scope='module')
-def return_events(get_cat):
-    events = []
-    for event in get_cat:
-        events.append(event)
-    return events
+def return_events(parsed_catalog):
+    return parsed_catalog.events
 
 @pytest.fixture(scope='module')
-def return_event_comments(get_cat):
-    comments = []
-    for event in get_cat:
-        for comment in event.comments:
-            comments.append(comment)
-    return comments
+def return_event_comments(parsed_catalog):
+    return parsed_catalog.comments
 
 class Test_S2OB_events():
     def test_type(self, return_events):
@@ -188,12 +301,8 @@ class Test_S2OB_event_comments:
 ######## test origins
     
 @pytest.fixture(scope='module')
-def return_origins(return_events):
-    origins = []
-    for event in return_events:
-        for origin in event.origins:
-            origins.append(origin)
-    return origins
+def return_origins(parsed_catalog):
+    return parsed_catalog.origins
 
 class Test_S2OB_origins():
     def test_type(self, return_origins):
@@ -202,11 +311,12 @@ class Test_S2OB_origins():
             assert isinstance(origin, obspy.core.event.Origin)
     def test_lat_lon(self, return_origins):
         origins = return_origins
-        for origin in origins:
-            assert abs(origin.longitude) <= 180
-            assert abs(origin.latitude) <= 90
-            assert abs(origin.latitude) <= 90
-            assert abs(origin.longitude) <= 180
+        lats = np.fromiter((ori.latitude for ori in origins), dtype=np.float64,
+                           count=len(origins))
+        lons = np.fromiter((ori.longitude for ori in origins), dtype=np.float64,
+                           count=len(origins))
+        assert np.all(np.abs(lats) <= 90)
+        assert np.all(np.abs(lons) <= 180)
     def test_has_creation_info(self, return_origins):
         origins = return_origins
         for origin in origins:
@@ -219,82 +329,70 @@ class Test_S2OB_origins():
 ########### test Arrivals
     
 @pytest.fixture(scope='module')
-def return_arrivals(return_events):
-    arrivals_lists = []
-    for event in return_events:
-        for origin in event.origins:
-            for arr in origin.arrivals:    
-                arrivals_lists.append(arr)
-    return arrivals_lists
+def return_arrivals(parsed_catalog):
+    return parsed_catalog.arrivals
 
 class Test_S2OB_arrivals:
     def test_type(self, return_arrivals):
         assert len(return_arrivals) > 0
         for ar in return_arrivals:
             assert isinstance(ar, obspy.core.event.Arrival)
-    def test_get_pick_from_id(self, return_arrivals):
+    def test_get_pick_from_id(self, return_arrivals, pick_by_id):
         for ar in return_arrivals:
-            pick_id = ar.pick_id
-            pick = pick_id.getReferredObject()
+            pick = pick_by_id[ar.pick_id.id]
             assert isinstance(pick, obspy.core.event.Pick)
             
 #####  test picks
         
 @pytest.fixture(scope='module')
-def return_picks(return_events):
-    picks = []
-    for event in return_events:
-        for pick in event.picks:
-            picks.append(pick)
-    return picks
+def return_picks(parsed_catalog):
+    return parsed_catalog.picks
+
+@pytest.fixture(scope='module')
+def pick_by_id(return_picks):
+    return {pick.resource_id.id: pick for pick in return_picks}
     
+# (attribute, expected type, allowed values or None) for every pick
+pick_spec = [('time', obspy.UTCDateTime, None),
+             ('evaluation_mode', text, frozenset(("manual", "automatic"))),
+             ('phase_hint', text, None),
+             ('polarity', text, 
+              frozenset(("positive", "negative", "undecidable"))),
+             ('onset', text, 
+              frozenset(("emergent", "impulsive", "questionable"))),
+             ('waveform_id', obspy.core.event.WaveformStreamID, None)]
+
+def _make_pick_validator(spec):
+    """
+    Write and compile one straight line function that asserts the type (and
+    allowed values) of each attribute in spec on a pick. Exec'd code doesnt
+    get pytest's assert rewriting, so each assert names its field and value
+    """
+    namespace = {'_Pick': obspy.core.event.Pick}
+    src = ('def validate(pick):\n'
+           '    assert isinstance(pick, _Pick), ("pick", pick)\n')
+    for num, (name, typ, allowed) in enumerate(spec):
+        namespace['_t%d' % num], namespace['_a%d' % num] = typ, allowed
+        src += '    v = pick.%s\n' % name
+        src += '    assert isinstance(v, _t%d), (%r, v)\n' % (num, name)
+        if allowed is not None:
+            src += '    assert v in _a%d, (%r, v)\n' % (num, name)
+    exec(src, namespace)
+    return namespace['validate']
+
+validate_pick = _make_pick_validator(pick_spec)
+
 class Test_S2OB_Picks():
-    def test_type(self, return_picks):
-        for pick in return_picks:
-            assert isinstance(pick, obspy.core.event.Pick)
-    
-    def test_time(self, return_picks):
-        for pick in return_picks:
-            assert hasattr(pick, 'time')
-            assert isinstance(pick.time, obspy.UTCDateTime)
-    
-    def test_eval_mode(self, return_picks):
-        allowed_vals = ("manual", "automatic")
-        for pick in return_picks:
-            assert hasattr(pick, 'evaluation_mode')
-            assert isinstance(pick.evaluation_mode, text)
-            assert pick.evaluation_mode in allowed_vals
-    
-    def test_phase_hint(self, return_picks):
-        for pick in return_picks:
-            assert hasattr(pick, 'phase_hint')
-            assert isinstance(pick.phase_hint, text)
-    
-    def test_polarity(self, return_picks):
-        allowed_vals = ("positive", "negative", "undecidable")
+    def test_pick_fields(self, return_picks):
         for pick in return_picks:
-            assert hasattr(pick, 'polarity')
-            assert isinstance(pick.polarity, text)
-            assert pick.polarity in allowed_vals
-    
-    def test_onset(self, return_picks):
-        allowed_vals = ("emergent", "impulsive", "questionable")
-        for pick in return_picks:
-            assert hasattr(pick, 'onset')
-            assert isinstance(pick.onset, text)
-            assert pick.onset in allowed_vals        
-            
-    def test_waveform_id(self, return_picks):
-        for pick in return_picks:
-            assert hasattr(pick, 'waveform_id')
-            assert isinstance(pick.waveform_id, obspy.core.event.WaveformStreamID)
+            validate_pick(pick)
             assert len(pick.waveform_id.channel_code) == 3 # chan code is 3 chars
             
 g1 = ' 1996 1021 2359 59.0 L  61.689   3.259 15.0  TES 35 3.0 3.3LTES 3.0CTES 3.2LNAO1'
 g4 = ' FOO  SZ IS       2401 10.01                              70   -1.2710 95.1  95 '
 @pytest.fixture()
-def setup_seperate_day():
-    so = seisobs.core.Seisob()
+def setup_seperate_day(seisob):
+    so = seisob
     s1 = seisobs.core.Sline(g1)
     s4 = seisobs.core.Sline(g4)
     return so, s4.sseries, so._get_utc(s1.sseries) 
@@ -309,12 +407,10 @@ def test_get_pick_time_different_day(setup_seperate_day):
 ######## test magnitudes
 
 @pytest.fixture(scope='module')
-def return_magnitudes(return_events):
-    magnitudes = []
-    for event in return_events:
-        for mag in event.magnitudes:
-            magnitudes.append(mag)
-    return magnitudes
+def return_magnitudes(parsed_catalog):
+    return parsed_catalog.mags
+
+MAG_KEY_SET = frozenset(seisobs.specs.mag_key.values())
 
 class Test_S2OB_Magnitudes:
     def test_length(self, return_magnitudes):
@@ -326,10 +422,9 @@ class Test_S2OB_Magnitudes:
         for mag in return_magnitudes:
             assert isinstance(mag.mag, float)
     def test_mtypes(self, return_magnitudes):
-        mk_vals = seisobs.specs.mag_key.values()
         for mag in return_magnitudes:
             assert isinstance(mag.magnitude_type, text)
-            assert mag.magnitude_type in mk_vals
+            assert mag.magnitude_type in MAG_KEY_SET
     # make sure blank lines didnt make it into magnitude list
     def test_no_defualts(self, return_magnitudes): 
         for mag in return_magnitudes:
@@ -338,11 +433,19 @@ class Test_S2OB_Magnitudes:
 ####### test amplitudes
 
 @pytest.fixture(scope='module')
-def return_amplitudes(return_events):
-    amplitudes = []
-    for amplitude in return_events.amplitudes:
-        amplitudes.append(amplitude)
-    return amplitudes
+def return_amplitudes(parsed_catalog):
+    return parsed_catalog.amplitudes
+
+class Test_S2OB_Amplitudes:
+    def test_type(self, return_amplitudes):
+        assert len(return_amplitudes) > 0
+        for amp in return_amplitudes:
+            assert isinstance(amp, obspy.core.event.Amplitude)
+            assert isinstance(amp.generic_amplitude, float)
+    def test_one_per_amp_pick(self, return_amplitudes, return_picks):
+        amp_picks = [pick for pick in return_picks 
+                     if pick.phase_hint in seisobs.specs.amp_phases]
+        assert len(return_amplitudes) == len(amp_picks)
 
 ############# Test read lines
 ## Linetype 1 tests
@@ -357,6 +460,8 @@ bl12 = ' 1996  625 0337 31.0 L  61.689   3.259 15.0  TES 35 3.0 3.3LTES 3.0CTES
 bl13 = ' 1996  625 0337 31.0 L  61.689   3.259 15.0  TES 35 3.0 3.3LTES 3.0CTES 3.2LNAOH'
 # bad line 14 invalid lat/lon
 bl14 = ' 1996  625 0337 31.0 L  99.689   3.259 15.0  TES 35 3.0 3.3LTES 3.0CTES 3.2LNAO1'
+# good line 12, blank linetype (read as 4 first) with a letter agency in 77-79
+gl12 = ' 1996  625 0337 31.0 L  61.689   3.259 15.0  TES 35 3.0 3.3LTES 3.0CTES 3.2LNAO '
 
 ## Linetype 4 tests
 gl41 = ' FOO  SZ IS        337 56.01                              70   -1.2710 95.1  95 '
@@ -379,12 +484,13 @@ gli2 = ' ACTION:HIN 16-02-02 12:01 OP:DC   STATUS:               ID:201602021415
 
 # line type F
 glf1 = '      94.0      32.0     -62.0  9.0 15.0  6.0  0.0  0.1           SMR FPFIT    F'
+# column 79 holds a user flag, not a blank
+glf2 = '     73.0   49.0    50.0                                                      OF'
 
 # good lines (shouldn't raise anything by passing all validations)
 gls = [gl11, gl41, gl42, gl31, gl61, gl71, gle1, gli1, gli2]
-@pytest.fixture(scope='module', params=gls)
-def get_good_lines(request):
-    return request.param
+# (line, expected linetype) for each good line
+GOOD_LINES = list(zip(gls, ['1', '4', '4', '3', '6', '7', 'E', 'I', 'I']))
 
 # badlines, raises ValueError
 blv = [bl11, bl13, bl14]
@@ -399,9 +505,9 @@ def get_bad_key_lines(request):
     return request.param
 
 class TestSLines:
-    def test_good_line11(self, get_good_lines):
-        sline = seisobs.core.Sline(get_good_lines)
-        assert isinstance(sline, seisobs.core.Sline)
+    @pytest.mark.parametrize('line_str, expected', GOOD_LINES)
+    def test_good_lines(self, line_str, expected):
+        assert seisobs.core.Sline(line_str).slinetype == expected
     
     def test_bad_value_lines(self, get_bad_value_lines):
         with pytest.raises(ValueError):
@@ -410,6 +516,17 @@ class TestSLines:
     def test_bad_key_lines(self, get_bad_key_lines):
         with pytest.raises(KeyError):
             seisobs.core.Sline(get_bad_key_lines)
+    
+    def test_f_line_user_flag(self):
+        sline = seisobs.core.Sline(glf2)
+        assert sline.slinetype == 'F'
+        assert sline.sseries.userflag == 'O'
+    
+    def test_blank_linetype_falls_back_to_1(self):
+        sline = seisobs.core.Sline(gl12)
+        assert sline.slinetype == '1'
+        assert sline.sseries.linetype == '1'
+        assert sline.sseries.mag3agency == 'NAO'
 
 ############# Tests for StringConverter
 
@@ -452,4 +569,5 @@ class Test_String_Converter:
         strout = sc(obj, strip_decimal)
         objout = sc(string)
         assert strout == string
-        assert objout == obj
\ No newline at end of file
+        assert objout == obj
+        assert type(objout) == type(obj)
\ No newline at end of file